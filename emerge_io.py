@@ -0,0 +1,75 @@
+"""Shared figure and export helpers for the E.M.E.R.G.E+ generator scripts."""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Sequence
+import numpy as np
+
+# matplotlib and polars are imported lazily (in the helpers below and in the
+# scripts' main) to keep module import cheap for code paths that never render
+# or write tables.
+if TYPE_CHECKING:
+    from matplotlib.axes import Axes
+
+
+def ensure_outdir(outdir: Path) -> None:
+    outdir.mkdir(parents=True, exist_ok=True)
+
+
+def _save(fig, path: Path) -> None:
+    fig.tight_layout()
+    fig.savefig(path, dpi=200)
+
+
+def render(path: Path, plot_fn: Callable[[Axes], None]) -> None:
+    """Draw one figure with plot_fn and save it as a 200-dpi PNG.
+
+    A standalone Figure is used so that no pyplot state is left behind.
+    """
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    plot_fn(fig.subplots())
+    _save(fig, path)
+
+
+def render_panel(path: Path, plot_fns: Sequence[Callable[[Axes], None]]) -> None:
+    """Draw up to four plot functions into one 2x2 supplementary panel and save it."""
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(11, 8))
+    for ax, plot_fn in zip(fig.subplots(2, 2).flat, plot_fns):
+        plot_fn(ax)
+    _save(fig, path)
+
+
+def stride(arr: np.ndarray, n: int = 2000) -> np.ndarray:
+    """Plot-only copy of arr thinned to at most ~n points, keeping both endpoints.
+
+    Exports always use the full-resolution arrays.
+    """
+    s = max(1, -(-len(arr) // n))
+    if s == 1:
+        return arr
+    return np.append(arr[:-1:s], arr[-1])
+
+
+def sample_indices(sample_times: np.ndarray, dt: float, n: int) -> np.ndarray:
+    """Nearest-sample indices of sample_times on the uniform grid 0, dt, ..., (n-1)*dt."""
+    return np.clip(np.round(sample_times / dt).astype(np.intp), 0, n - 1)
+
+
+def write_full_timeseries(path_stem: Path, cols: Dict[str, np.ndarray], full_csv: bool = False) -> None:
+    """Write the full time series in cols next to path_stem.
+
+    Always writes <stem>.parquet (Snappy) and <stem>.npz, a NumPy-native copy
+    readable with np.load(path)[col]; <stem>.csv only when full_csv is set.
+    """
+    import polars as pl
+
+    full = pl.DataFrame(cols)
+    full.write_parquet(path_stem.with_suffix(".parquet"), compression="snappy")
+    np.savez_compressed(path_stem.with_suffix(".npz"), **cols)
+    if full_csv:
+        full.write_csv(path_stem.with_suffix(".csv"))
@@ -2,27 +2,41 @@
 
 from __future__ import annotations
 
-import os
 from pathlib import Path
+from typing import TYPE_CHECKING, Tuple
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
 
-from emerge_core import RoutineParams, RoutineConfig, simulate_routine, time_to_threshold, sample_at_times
+from emerge_core import (RoutineParams, RoutineConfig, draw_routine_drivers,
+                         simulate_routine, simulate_routine_batch, time_to_threshold)
+from emerge_io import ensure_outdir, render, sample_indices, stride, write_full_timeseries
 
+if TYPE_CHECKING:
+    from matplotlib.axes import Axes
 
-def _ensure_outdir(outdir: Path) -> None:
-    outdir.mkdir(parents=True, exist_ok=True)
 
+def _summarize(r: np.ndarray, thr: float) -> Tuple[float, float, float, float]:
+    """Reduce one routine simulation to (Psi_final, H_e_final, M_r_final, time_to_thr_s)."""
+    return (
+        float(r["Psi"][-1]),
+        float(r["H_e"][-1]),
+        float(r["M_r"][-1]),
+        float(time_to_threshold(r["t_s"], r["M_r"], thr)),
+    )
+
+
+def main(outdir: str = "outputs", full_csv: bool = False) -> None:
+    import polars as pl
 
-def main(outdir: str = "outputs") -> None:
     out = Path(outdir)
-    _ensure_outdir(out)
+    ensure_outdir(out)
 
     params = RoutineParams()
     cfg = RoutineConfig()
 
-    res = simulate_routine(params, cfg)
+    # The main run and the alpha_E sweep share cfg: draw their inputs and noise once.
+    drivers = draw_routine_drivers(cfg)
+
+    res = simulate_routine(params, cfg, drivers=drivers)
 
     t = res["t_s"]
     H_e = res["H_e"]
@@ -32,69 +46,71 @@ def main(outdir: str = "outputs") -> None:
     Psi = res["Psi"]
     M = res["M_r"]
 
+    t_p, H_e_p, H_c_p, E_p, C_p, Psi_p, M_p = (
+        stride(a) for a in (t, H_e, H_c, E, C, Psi, M)
+    )
+
     # Figure 1: routine entropy trajectories
-    plt.figure()
-    plt.plot(t, H_e, label="H_e (emotional entropy proxy)")
-    plt.plot(t, H_c, label="H_c (cognitive entropy proxy)")
-    plt.xlabel("Time (s)")
-    plt.ylabel("Arbitrary units")
-    plt.title("Routine entropy trajectories (illustrative simulation)")
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig(out / "routine_entropy.png", dpi=200)
-    plt.close()
+    def plot_entropy(ax: Axes) -> None:
+        ax.plot(t_p, H_e_p, label="H_e (emotional entropy proxy)")
+        ax.plot(t_p, H_c_p, label="H_c (cognitive entropy proxy)")
+        ax.set_xlabel("Time (s)")
+        ax.set_ylabel("Arbitrary units")
+        ax.set_title("Routine entropy trajectories (illustrative simulation)")
+        ax.legend()
 
     # Figure 2: routine meaning
-    plt.figure()
-    plt.plot(t, M, label="M_r (0–1)")
-    plt.xlabel("Time (s)")
-    plt.ylabel("Meaning (0–1)")
-    plt.title("Routine meaning emergence (illustrative simulation)")
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig(out / "routine_meaning.png", dpi=200)
-    plt.close()
+    def plot_meaning(ax: Axes) -> None:
+        ax.plot(t_p, M_p, label="M_r (0–1)")
+        ax.set_xlabel("Time (s)")
+        ax.set_ylabel("Meaning (0–1)")
+        ax.set_title("Routine meaning emergence (illustrative simulation)")
+        ax.legend()
 
     # Figure 3: routine inputs
-    plt.figure()
-    plt.plot(t, E, label="E (emotional energy input)")
-    plt.plot(t, C, label="C (cognitive structure input)")
-    plt.xlabel("Time (s)")
-    plt.ylabel("Normalized input (0–1)")
-    plt.title("Routine input signals (stylized)")
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig(out / "routine_inputs.png", dpi=200)
-    plt.close()
+    def plot_inputs(ax: Axes) -> None:
+        ax.plot(t_p, E_p, label="E (emotional energy input)")
+        ax.plot(t_p, C_p, label="C (cognitive structure input)")
+        ax.set_xlabel("Time (s)")
+        ax.set_ylabel("Normalized input (0–1)")
+        ax.set_title("Routine input signals (stylized)")
+        ax.legend()
 
     # Figure 4: cultural adaptation
-    plt.figure()
-    plt.plot(t, Psi, label="Ψ (cultural factor)")
-    plt.xlabel("Time (s)")
-    plt.ylabel("Ψ (0–1, arbitrary)")
-    plt.title("Cultural adaptation in routine dynamics (stylized)")
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig(out / "routine_culture.png", dpi=200)
-    plt.close()
+    def plot_culture(ax: Axes) -> None:
+        ax.plot(t_p, Psi_p, label="Ψ (cultural factor)")
+        ax.set_xlabel("Time (s)")
+        ax.set_ylabel("Ψ (0–1, arbitrary)")
+        ax.set_title("Cultural adaptation in routine dynamics (stylized)")
+        ax.legend()
+
+    figures = [
+        (out / "routine_entropy.png", plot_entropy),
+        (out / "routine_meaning.png", plot_meaning),
+        (out / "routine_inputs.png", plot_inputs),
+        (out / "routine_culture.png", plot_culture),
+    ]
+    for path, plot_fn in figures:
+        render(path, plot_fn)
 
     # Table: Demonstration 1 sampled points (0,2,5,10 s)
     sample_times = np.array([0.0, 2.0, 5.0, 10.0], dtype=float)
-    He_s = sample_at_times(t, H_e, sample_times)
-    Mr_s = sample_at_times(t, M, sample_times)
+    idx = sample_indices(sample_times, cfg.dt_s, len(t))
+    He_s = H_e[idx]
+    Mr_s = M[idx]
 
-    table_demo1 = pd.DataFrame({
+    table_demo1 = pl.DataFrame({
         "time_s": sample_times,
         "H_e": He_s,
         "M_r": Mr_s
     })
-    table_demo1.to_csv(out / "table_demo1_routine_timepoints.csv", index=False)
+    table_demo1.write_csv(out / "table_demo1_routine_timepoints.csv")
 
     # Demonstration 3: cultural modulation (two group norms / baselines)
     # We keep everything identical except group norm and initial Ψ to mimic
     # 'restrained' vs 'expressive' conditions.
-    def run_culture(psi0: float, S_group: float, seed_offset: int = 0):
-        cfg2 = RoutineConfig(
+    def culture_cfg(psi0: float, S_group: float, seed_offset: int = 0) -> RoutineConfig:
+        return RoutineConfig(
             duration_s=cfg.duration_s,
             dt_s=cfg.dt_s,
             seed=cfg.seed + seed_offset,
@@ -105,44 +121,61 @@ def main(outdir: str = "outputs") -> None:
             S_group=S_group,
             baseline_frac=cfg.baseline_frac,
         )
-        r = simulate_routine(params, cfg2)
-        t2 = r["t_s"]
-        M2 = r["M_r"]
-        return {
-            "psi0": psi0,
-            "S_group": S_group,
-            "Psi_final": float(r["Psi"][-1]),
-            "H_e_final": float(r["H_e"][-1]),
-            "M_r_final": float(M2[-1]),
-            "time_to_M_gt_0p35_s": float(time_to_threshold(t2, M2, 0.35)),
-        }
-
-    culture_rows = [
-        run_culture(psi0=0.32, S_group=0.32, seed_offset=1),
-        run_culture(psi0=0.68, S_group=0.68, seed_offset=2),
+
+    culture_conditions = [
+        (0.32, 0.32, 1),
+        (0.68, 0.68, 2),
     ]
-    table_culture = pd.DataFrame(culture_rows)
-    table_culture.to_csv(out / "table_demo3_culture.csv", index=False)
 
     # Parameter sensitivity (vary alpha_E)
     alpha_values = [0.2, 0.4, 0.6]
-    sens_rows = []
-    for k, a in enumerate(alpha_values):
-        p2 = RoutineParams(alpha_E=a)
-        r2 = simulate_routine(p2, cfg)
-        t2 = r2["t_s"]
-        M2 = r2["M_r"]
-        sens_rows.append({
-            "alpha_E": a,
-            "time_to_M_gt_0p40_s": float(time_to_threshold(t2, M2, 0.40)),
-            "M_r_final": float(M2[-1]),
-            "H_e_final": float(r2["H_e"][-1]),
-        })
-    table_sens = pd.DataFrame(sens_rows)
-    table_sens.to_csv(out / "table_demo4_parameter_sensitivity.csv", index=False)
+
+    # The culture runs use different configs (seeds), so they are not batched.
+    culture_results = [_summarize(simulate_routine(params, culture_cfg(psi0, S_group, off)), 0.35)
+                       for psi0, S_group, off in culture_conditions]
+    n_culture = len(culture_conditions)
+
+    # The sensitivity runs share cfg, so one batched kernel reuses the same
+    # inputs and noise realization for every alpha_E.
+    sens_results = [_summarize(r, 0.40)
+                    for r in simulate_routine_batch([RoutineParams(alpha_E=a) for a in alpha_values], cfg, drivers=drivers)]
+
+    n_sens = len(alpha_values)
+    psi_final = np.empty(n_culture)
+    He_final_c = np.empty(n_culture)
+    Mr_final_c = np.empty(n_culture)
+    t_thr_c = np.empty(n_culture)
+    for k, r in enumerate(culture_results):
+        psi_final[k], He_final_c[k], Mr_final_c[k], t_thr_c[k] = r
+
+    culture_arr = np.asarray(culture_conditions, dtype=float)
+    table_culture = pl.DataFrame({
+        "psi0": culture_arr[:, 0],
+        "S_group": culture_arr[:, 1],
+        "Psi_final": psi_final,
+        "H_e_final": He_final_c,
+        "M_r_final": Mr_final_c,
+        "time_to_M_gt_0p35_s": t_thr_c,
+    })
+    table_culture.write_csv(out / "table_demo3_culture.csv")
+
+    alpha_arr = np.asarray(alpha_values, dtype=float)
+    t_thr = np.empty(n_sens)
+    M_final = np.empty_like(t_thr)
+    He_final = np.empty_like(t_thr)
+    for k, r in enumerate(sens_results):
+        _, He_final[k], M_final[k], t_thr[k] = r
+
+    table_sens = pl.DataFrame({
+        "alpha_E": alpha_arr,
+        "time_to_M_gt_0p40_s": t_thr,
+        "M_r_final": M_final,
+        "H_e_final": He_final,
+    })
+    table_sens.write_csv(out / "table_demo4_parameter_sensitivity.csv")
 
     # Full timeseries exports (for transparency)
-    full = pd.DataFrame({
+    full_cols = {
         "time_s": t,
         "E": E,
         "C": C,
@@ -150,8 +183,8 @@ def main(outdir: str = "outputs") -> None:
         "H_e": H_e,
         "H_c": H_c,
         "M_r": M,
-    })
-    full.to_csv(out / "routine_timeseries_full.csv", index=False)
+    }
+    write_full_timeseries(out / "routine_timeseries_full", full_cols, full_csv)
 
     print(f"Saved routine outputs to: {out.resolve()}")
 
@@ -3,20 +3,21 @@
 from __future__ import annotations
 
 from pathlib import Path
+from typing import TYPE_CHECKING
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
 
-from emerge_core import TransformativeParams, TransformativeConfig, simulate_transformative, sample_at_times
+from emerge_core import TransformativeParams, TransformativeConfig, simulate_transformative
+from emerge_io import ensure_outdir, render, render_panel, sample_indices, stride, write_full_timeseries
 
+if TYPE_CHECKING:
+    from matplotlib.axes import Axes
 
-def _ensure_outdir(outdir: Path) -> None:
-    outdir.mkdir(parents=True, exist_ok=True)
 
+def main(outdir: str = "outputs", full_csv: bool = False, panel: bool = False) -> None:
+    import polars as pl
 
-def main(outdir: str = "outputs") -> None:
     out = Path(outdir)
-    _ensure_outdir(out)
+    ensure_outdir(out)
 
     params = TransformativeParams()
     cfg = TransformativeConfig()
@@ -31,85 +32,91 @@ def main(outdir: str = "outputs") -> None:
     M_t = res["M_t"]
     t_peak = float(res["t_peak_h"][0])
 
+    t_p, D_p, H_e_p, E_p, C_p, M_t_p = (
+        stride(a) for a in (t, D, H_e, E, C, M_t)
+    )
+
     # Figure 5: perturbation profile
-    plt.figure()
-    plt.plot(t, D, label="D(t) (stylized perturbation)")
-    plt.axvline(t_peak, linestyle="--", label=f"t_peak = {t_peak:.2f} h")
-    plt.xlabel("Time (h)")
-    plt.ylabel("Perturbation (arb.u.)")
-    plt.title("Transformative perturbation profile (stylized)")
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig(out / "transformative_drug_profile.png", dpi=200)
-    plt.close()
+    def plot_drug_profile(ax: Axes) -> None:
+        ax.plot(t_p, D_p, label="D(t) (stylized perturbation)")
+        ax.axvline(t_peak, linestyle="--", label=f"t_peak = {t_peak:.2f} h")
+        ax.set_xlabel("Time (h)")
+        ax.set_ylabel("Perturbation (arb.u.)")
+        ax.set_title("Transformative perturbation profile (stylized)")
+        ax.legend()
 
     # Figure 6: biphasic entropy trajectory
-    plt.figure()
-    plt.plot(t, H_e, label="H_e(t)")
-    plt.axvline(t_peak, linestyle="--", label="t_peak")
-    plt.axhline(0.0, linestyle=":", label="baseline (H_e=0)")
-    plt.xlabel("Time (h)")
-    plt.ylabel("Arbitrary units")
-    plt.title("Transformative biphasic entropy trajectory (illustrative)")
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig(out / "transformative_entropy.png", dpi=200)
-    plt.close()
+    def plot_entropy(ax: Axes) -> None:
+        ax.plot(t_p, H_e_p, label="H_e(t)")
+        ax.axvline(t_peak, linestyle="--", label="t_peak")
+        ax.axhline(0.0, linestyle=":", label="baseline (H_e=0)")
+        ax.set_xlabel("Time (h)")
+        ax.set_ylabel("Arbitrary units")
+        ax.set_title("Transformative biphasic entropy trajectory (illustrative)")
+        ax.legend()
 
     # Figure 7: meaning trajectory (cumulative)
-    plt.figure()
-    plt.plot(t, M_t, label="M_t (normalized cumulative)")
-    plt.axvline(t_peak, linestyle="--", label="t_peak")
-    plt.xlabel("Time (h)")
-    plt.ylabel("Cumulative meaning (0–1)")
-    plt.title("Transformative meaning trajectory (illustrative)")
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig(out / "transformative_meaning.png", dpi=200)
-    plt.close()
+    def plot_meaning(ax: Axes) -> None:
+        ax.plot(t_p, M_t_p, label="M_t (normalized cumulative)")
+        ax.axvline(t_peak, linestyle="--", label="t_peak")
+        ax.set_xlabel("Time (h)")
+        ax.set_ylabel("Cumulative meaning (0–1)")
+        ax.set_title("Transformative meaning trajectory (illustrative)")
+        ax.legend()
 
     # Optional: inputs used (E and C)
-    plt.figure()
-    plt.plot(t, E, label="E (stylized)")
-    plt.plot(t, C, label="C (stylized)")
-    plt.xlabel("Time (h)")
-    plt.ylabel("Normalized (0–1)")
-    plt.title("Transformative input signals (stylized)")
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig(out / "transformative_inputs.png", dpi=200)
-    plt.close()
+    def plot_inputs(ax: Axes) -> None:
+        ax.plot(t_p, E_p, label="E (stylized)")
+        ax.plot(t_p, C_p, label="C (stylized)")
+        ax.set_xlabel("Time (h)")
+        ax.set_ylabel("Normalized (0–1)")
+        ax.set_title("Transformative input signals (stylized)")
+        ax.legend()
+
+    figures = [
+        (out / "transformative_drug_profile.png", plot_drug_profile),
+        (out / "transformative_entropy.png", plot_entropy),
+        (out / "transformative_meaning.png", plot_meaning),
+        (out / "transformative_inputs.png", plot_inputs),
+    ]
+    for path, plot_fn in figures:
+        render(path, plot_fn)
+    # Figures 5-7 are referenced individually in the manuscript, so the single
+    # panels stay; the 2x2 supplementary panel is an opt-in extra render.
+    if panel:
+        render_panel(out / "transformative_panel.png", [plot_fn for _, plot_fn in figures])
 
     # Table: key timepoints (0,1,2,3,4,5,6,8 h)
     sample_times = np.array([0.0, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 8.0], dtype=float)
-    He_s = sample_at_times(t, H_e, sample_times)
-    Mt_s = sample_at_times(t, M_t, sample_times)
+    idx = sample_indices(sample_times, cfg.dt_h, len(t))
+    He_s = H_e[idx]
+    Mt_s = M_t[idx]
 
-    table_demo2 = pd.DataFrame({
+    table_demo2 = pl.DataFrame({
         "time_h": sample_times,
         "H_e": He_s,
         "M_t": Mt_s,
     })
-    table_demo2.to_csv(out / "table_demo2_transformative_timepoints.csv", index=False)
+    table_demo2.write_csv(out / "table_demo2_transformative_timepoints.csv")
 
     # Full timeseries exports
-    full = pd.DataFrame({
+    full_cols = {
         "time_h": t,
         "D": D,
         "E": E,
         "C": C,
         "H_e": H_e,
         "M_t": M_t,
+    }
+    write_full_timeseries(out / "transformative_timeseries_full", full_cols, full_csv)
+
+    meta = pl.DataFrame({
+        "t_peak_h": [t_peak],
+        "dt_h": [cfg.dt_h],
+        "duration_h": [cfg.duration_h],
+        "seed": [cfg.seed],
     })
-    full.to_csv(out / "transformative_timeseries_full.csv", index=False)
-
-    meta = pd.DataFrame([{
-        "t_peak_h": t_peak,
-        "dt_h": cfg.dt_h,
-        "duration_h": cfg.duration_h,
-        "seed": cfg.seed,
-    }])
-    meta.to_csv(out / "transformative_metadata.csv", index=False)
+    meta.write_csv(out / "transformative_metadata.csv")
 
     print(f"Saved transformative outputs to: {out.resolve()}")
 